@@ -5,45 +5,112 @@
 from __future__ import annotations
 
 from pathlib import Path
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 
-# seaborn styling
-sns.set_theme(style="whitegrid")
+from .revenue_calculator import ENGINES, _month_start, _parse_dates
+
+# seaborn styling is applied the first time save_plots runs
+_STYLED = False
+
+
+def _monthly_totals(df: pd.DataFrame) -> pd.DataFrame:
+    """Monthly encounters / minutes / revenue sums, without a groupby."""
+    # Stable sort by month (cheap when the data is already in date order),
+    # then sum each month's contiguous run with np.add.reduceat
+    month = df["month"].to_numpy()
+    order = np.argsort(month, kind="stable")
+    month = month[order]
+
+    # Index where each month's run starts
+    is_start = np.ones(len(month), dtype=bool)
+    is_start[1:] = month[1:] != month[:-1]
+    starts = np.flatnonzero(is_start)
+
+    # NaN -> 0 so missing values are skipped like pandas' sum; accumulate in float64
+    duration = df["duration_min"].fillna(0).to_numpy()[order]
+    revenue = df["revenue"].fillna(0).to_numpy()[order]
+
+    return pd.DataFrame({
+        "month": month[starts],
+        "encounters": np.diff(np.r_[starts, len(month)]).astype(np.int64),
+        "client_hours": np.add.reduceat(duration, starts, dtype=np.float64),
+        "revenue": np.add.reduceat(revenue, starts, dtype=np.float64),
+    })
+
+
+def _monthly_totals_polars(df: pd.DataFrame) -> pd.DataFrame:
+    """Polars version of the monthly encounters / minutes / revenue sums."""
+    # Optional dependency, only needed for engine="polars"
+    import polars as pl
+
+    # Built from plain arrays so no pyarrow is needed; NaN -> null so sums skip them like pandas.
+    # polars only takes ms/us/ns datetimes, so month goes in as us and comes back in its own unit
+    month = df["month"].to_numpy()
+    lf = pl.DataFrame(
+        {
+            "month": month.astype("datetime64[us]"),
+            "duration_min": df["duration_min"].to_numpy(),
+            "revenue": df["revenue"].to_numpy(),
+        },
+        nan_to_null=True,
+    ).lazy()
+
+    monthly = (
+        lf.group_by("month")
+        .agg(
+            pl.len().cast(pl.Int64).alias("encounters"),
+            pl.col("duration_min").cast(pl.Float64).sum().alias("client_hours"),
+            pl.col("revenue").cast(pl.Float64).sum().alias("revenue"),
+        )
+        .sort("month")
+        .collect()
+    )
+    out = pd.DataFrame({col: monthly[col].to_numpy() for col in monthly.columns})
+    out["month"] = out["month"].to_numpy().astype(month.dtype)
+    return out
 
 
-def compute_monthly_kpis(encounters_with_revenue: pd.DataFrame) -> pd.DataFrame:
+def compute_monthly_kpis(
+    encounters_with_revenue: pd.DataFrame,
+    engine: str = "pandas",
+) -> pd.DataFrame:
     """
     Input: encounter-level dataframe that includes:
     - encounter_date
     - duration_min
     - revenue
 
+    Optional:
+    - engine (str): "pandas" (default) or "polars" (needs polars installed)
+
     Output: monthly KPI table.
     """
-    df = encounters_with_revenue.copy()
+    # Basic input check so we don't silently pick the wrong thing
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine={engine}. Use one of: {list(ENGINES)}")
+
+    # Only these columns are used; shallow copy since whole columns get replaced below
+    df = encounters_with_revenue[["encounter_date", "duration_min", "revenue"]].copy(deep=False)
 
     # Make sure types are right
-    df["encounter_date"] = pd.to_datetime(df["encounter_date"], errors="coerce")
-    df["duration_min"] = pd.to_numeric(df["duration_min"], errors="coerce")
+    df["encounter_date"] = _parse_dates(df["encounter_date"])
+    df["duration_min"] = pd.to_numeric(df["duration_min"], errors="coerce").astype("float32")
 
     # Drop rows with bad dates (shouldn't happen much after cleaning)
     df = df.dropna(subset=["encounter_date"])
 
     # Month bucket for grouping
-    df["month"] = df["encounter_date"].dt.to_period("M").dt.to_timestamp()
+    df["month"] = _month_start(df["encounter_date"])
 
     # Monthly totals
-    monthly = (
-        df.groupby("month", as_index=False)
-        .agg(
-            encounters=("revenue", "size"),
-            client_hours=("duration_min", lambda x: x.sum() / 60.0),
-            revenue=("revenue", "sum"),
-        )
-        .sort_values("month")
-    )
+    if engine == "polars":
+        monthly = _monthly_totals_polars(df)
+    else:
+        monthly = _monthly_totals(df)
+
+    # Minutes -> hours (done after the sums so they stay plain array sums)
+    monthly["client_hours"] /= 60.0
 
     # Extra KPIs
     monthly["revenue_per_hour"] = monthly["revenue"] / monthly["client_hours"]
@@ -61,20 +128,33 @@ def save_plots(
     out_dir: str | Path = "outputs",
     revenue_goal: float | None = None,
     utilization_goal: float | None = None,
+    dpi: int = 120,
 ) -> None:
     """
     Saves plots into outputs/.
     Optional:
     - revenue_goal (float): horizontal goal line for revenue
     - utilization_goal (float): horizontal goal line for utilization
+    - dpi (int): PNG resolution (120 is plenty for the README/dashboard charts)
     """
+    global _STYLED
+
+    # Plotting libraries are imported here so KPI-only callers never load them
+    from matplotlib.figure import Figure
     from matplotlib.ticker import FuncFormatter
     import matplotlib.dates as mdates
+    import seaborn as sns
+
+    # seaborn styling
+    if not _STYLED:
+        sns.set_theme(style="whitegrid")
+        _STYLED = True
 
     out_dir = Path(out_dir)
     out_dir.mkdir(parents=True, exist_ok=True)
 
-    df = monthly_kpis.copy()
+    # Read-only below, so no copy needed
+    df = monthly_kpis
 
     currency_fmt = FuncFormatter(lambda x, pos: f"${x:,.0f}")
     month_locator = mdates.MonthLocator(interval=1)
@@ -94,66 +174,68 @@ def save_plots(
         if y_is_currency:
             ax.yaxis.set_major_formatter(currency_fmt)
 
-    # 1) Revenue Trend
-    fig, ax = plt.subplots()
-    ax.plot(df["month"], df["revenue"], marker="o", linewidth=1.8)
-    ax.set_title("Monthly Revenue")
-    ax.set_xlabel("Month")
-    ax.set_ylabel("Revenue")
-    prettify(ax, y_is_currency=True)
-
-    if revenue_goal is not None:
-        ax.axhline(
-            revenue_goal,
-            linestyle="--",
-            linewidth=1.5,
-            label="Revenue Goal",
-        )
-        ax.legend()
+    # One figure/axes reused for every chart (cleared in between).
+    # Built from Figure directly so it renders off-screen with Agg and never
+    # touches pyplot's global figure state or the session's backend.
+    fig = Figure()
+    ax = fig.add_subplot()
+
+    def draw(
+        col,
+        title,
+        ylabel,
+        filename,
+        y_is_currency=False,
+        goal=None,
+        goal_label=None,
+        solve_layout=False,
+    ):
+        ax.clear()
+        ax.plot(df["month"], df[col], marker="o", linewidth=1.8)
+        ax.set_title(title)
+        ax.set_xlabel("Month")
+        ax.set_ylabel(ylabel)
+        prettify(ax, y_is_currency=y_is_currency)
+
+        if goal is not None:
+            ax.axhline(
+                goal,
+                linestyle="--",
+                linewidth=1.5,
+                label=goal_label,
+            )
+            ax.legend()
+
+        # The layout solver only runs once; the margins it sets stay on the figure
+        if solve_layout:
+            fig.tight_layout()
+        fig.savefig(out_dir / filename, dpi=dpi)
 
-    fig.tight_layout()
-    fig.savefig(out_dir / "revenue_trends.png", dpi=220)
-    plt.close(fig)
+    # 1) Revenue Trend
+    # (solves the layout for all charts: its currency tick labels are the widest)
+    draw(
+        "revenue",
+        "Monthly Revenue",
+        "Revenue",
+        "revenue_trends.png",
+        y_is_currency=True,
+        goal=revenue_goal,
+        goal_label="Revenue Goal",
+        solve_layout=True,
+    )
 
     # 2) Client Hours
-    fig, ax = plt.subplots()
-    ax.plot(df["month"], df["client_hours"], marker="o", linewidth=1.8)
-    ax.set_title("Monthly Client Hours")
-    ax.set_xlabel("Month")
-    ax.set_ylabel("Client Hours")
-    prettify(ax)
-    fig.tight_layout()
-    fig.savefig(out_dir / "client_hours_trends.png", dpi=220)
-    plt.close(fig)
+    draw("client_hours", "Monthly Client Hours", "Client Hours", "client_hours_trends.png")
 
     # 3) Utilization Rate
-    fig, ax = plt.subplots()
-    ax.plot(df["month"], df["utilization_rate"], marker="o", linewidth=1.8)
-    ax.set_title("Utilization Rate")
-    ax.set_xlabel("Month")
-    ax.set_ylabel("Utilization (Client Hours / 160)")
-    prettify(ax)
-
-    if utilization_goal is not None:
-        ax.axhline(
-            utilization_goal,
-            linestyle="--",
-            linewidth=1.5,
-            label="Utilization Goal",
-        )
-        ax.legend()
-
-    fig.tight_layout()
-    fig.savefig(out_dir / "utilization_rate.png", dpi=220)
-    plt.close(fig)
+    draw(
+        "utilization_rate",
+        "Utilization Rate",
+        "Utilization (Client Hours / 160)",
+        "utilization_rate.png",
+        goal=utilization_goal,
+        goal_label="Utilization Goal",
+    )
 
     # 4) Encounter Volume
-    fig, ax = plt.subplots()
-    ax.plot(df["month"], df["encounters"], marker="o", linewidth=1.8)
-    ax.set_title("Monthly Encounter Volume")
-    ax.set_xlabel("Month")
-    ax.set_ylabel("Encounters")
-    prettify(ax)
-    fig.tight_layout()
-    fig.savefig(out_dir / "encounter_volume.png", dpi=220)
-    plt.close(fig)
\ No newline at end of file
+    draw("encounters", "Monthly Encounter Volume", "Encounters", "encounter_volume.png")
@@ -71,6 +71,9 @@ RATE_TABLES = {
 # NOTE: H0038G is treated as "per encounter" in this simplified setup
 TIME_BASED_CODES = {"H0038", "H0004"}
 
+# Dataframe engines compute_revenue / compute_monthly_kpis can run on (polars is optional)
+ENGINES = ("pandas", "polars")
+
 
 def get_rates(fiscal_year: str = "FY24") -> dict[str, float]:
     """Return the billing rates for FY23, FY24, or FY25."""
@@ -80,41 +83,184 @@ def get_rates(fiscal_year: str = "FY24") -> dict[str, float]:
     return RATE_TABLES[fiscal_year]
 
 
+def _rate_lookup(rates: dict[str, float]) -> tuple[pd.Index, np.ndarray]:
+    """
+    Turn a rates dict into (codes, rates) arrays in the same order.
+    The rates array has one extra 0.0 at the end, which is what an unknown code
+    (get_indexer -> -1) picks up.
+    """
+    # Money stays float64: float32 can't hold most cent amounts exactly
+    codes = sorted(rates)
+    return pd.Index(codes), np.array([rates[c] for c in codes] + [0.0], dtype=np.float64)
+
+
+# Built once at import for the fiscal-year tables, so compute_revenue only has to
+# pick one (custom rates dicts are still converted per call).
+# NOTE: these are snapshots of RATE_TABLES taken at import; editing RATE_TABLES /
+# RATES_FY* at runtime won't reach them, so pass rates= for ad-hoc rate changes
+_FY_RATE_LOOKUPS = {fy: _rate_lookup(fy_rates) for fy, fy_rates in RATE_TABLES.items()}
+
+
+def _parse_dates(dates: pd.Series) -> pd.Series:
+    """
+    Parse encounter dates (bad values become NaT); already-parsed dates pass through.
+    Shared by compute_revenue and kpi_metrics.compute_monthly_kpis.
+
+    NOTE: format="ISO8601" accepts date and datetime strings mixed in one column
+    (e.g. "2024-02-07 10:00:00" next to "2024-01-05"). The old inferred-format parse
+    turned the odd ones into NaT and dropped them, so row counts can go up on such input.
+    """
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        return dates
+
+    # Dates are ISO strings after cleaning and repeat a lot (many encounters per day),
+    # so parse each distinct string once and map the results back by code
+    codes, uniques = pd.factorize(dates)
+    parsed = pd.to_datetime(uniques, errors="coerce", format="ISO8601")
+    return pd.Series(
+        parsed.take(codes, allow_fill=True, fill_value=pd.NaT),
+        index=dates.index,
+        name=dates.name,
+    )
+
+
 def _month_start(date_series: pd.Series) -> pd.Series:
     """Convert dates into month-start timestamps (e.g., 2024-02-01)."""
     # This makes grouping by month easy/consistent
-    return pd.to_datetime(date_series).dt.to_period("M").dt.to_timestamp()
+    # Truncating via datetime64[M] is a plain numpy cast (no Period round-trip)
+    dates = pd.to_datetime(date_series)
+    # numpy has no tz-aware datetimes; keep the local wall-clock month like to_period did
+    if dates.dt.tz is not None:
+        dates = dates.dt.tz_localize(None)
+    months = dates.to_numpy().astype("datetime64[M]").astype(dates.dtype)
+    return pd.Series(months, index=dates.index, name=dates.name)
+
+
+def _clean_duration(duration: pd.Series) -> pd.Series:
+    """Numeric float32 minutes; bad/missing values become 0."""
+    # float32 is plenty for minutes and halves the memory the later passes touch
+    return pd.to_numeric(duration, errors="coerce").fillna(0).astype(np.float32)
 
 
-def add_units(df: pd.DataFrame, time_based_codes: set[str] = TIME_BASED_CODES) -> pd.DataFrame:
+def _time_based_lookup(codes: pd.Categorical, time_based_codes: set[str]) -> np.ndarray:
+    """Boolean per category (+ a trailing False for missing codes, categorical code -1)."""
+    # Membership is checked once per distinct code instead of once per row
+    return np.append(codes.categories.isin(list(time_based_codes)), False)
+
+
+def add_units(
+    df: pd.DataFrame,
+    time_based_codes: set[str] = TIME_BASED_CODES,
+    codes: pd.Categorical | None = None,
+) -> pd.DataFrame:
     """
     Add a 'units' column.
     - Time-based codes: units = floor(duration_min / 15)
     - Per-encounter codes: units = 1
+
+    Optional:
+    - codes (pd.Categorical): cpt_code already converted to a Categorical
+      (row-aligned with df), so it isn't factorized twice
     """
-    out = df.copy()
+    # Shallow copy: whole columns are replaced below, never edited in place
+    out = df.copy(deep=False)
 
     # Make sure duration is numeric (bad values become NaN, then we fill with 0)
-    out["duration_min"] = pd.to_numeric(out["duration_min"], errors="coerce").fillna(0)
-
-    # Default: per encounter = 1 unit
-    out["units"] = 1
+    out["duration_min"] = _clean_duration(out["duration_min"])
 
-    # For time-based codes, compute 15-min units
-    is_time_based = out["cpt_code"].isin(time_based_codes)
-    out.loc[is_time_based, "units"] = np.floor(out.loc[is_time_based, "duration_min"] / 15).astype(int)
+    # Time-based codes get 15-min units, everything else is 1 unit per encounter
+    duration = out["duration_min"].to_numpy()
+    if codes is None:
+        codes = pd.Categorical(out["cpt_code"])
+    is_time_based = _time_based_lookup(codes, time_based_codes)[codes.codes]
+    units = np.where(is_time_based, np.floor(duration / 15).astype(np.int32), np.int32(1))
 
     # Guardrail: units should never be negative
-    out["units"] = out["units"].clip(lower=0)
+    np.maximum(units, 0, out=units)
+    out["units"] = units
 
     return out
 
 
+def _compute_revenue_polars(
+    month: np.ndarray,
+    codes: pd.Categorical,
+    duration: np.ndarray,
+    rate_arr: np.ndarray,
+    is_time_based_code: np.ndarray,
+) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Polars version of the units/revenue + monthly rollup steps (same rules as pandas).
+    Works on plain arrays and categorical codes, so it doesn't need pyarrow, and returns:
+    1) per-row units, rate, revenue
+    2) monthly revenue by code (missing codes kept, for the totals)
+    3) monthly total revenue
+    """
+    # Optional dependency, only needed for engine="polars"
+    import polars as pl
+
+    # polars only takes ms/us/ns datetimes; month starts are exact in us,
+    # and the input's unit is put back on the way out
+    lf = pl.DataFrame(
+        {"month": month.astype("datetime64[us]"), "code": codes.codes, "duration_min": duration}
+    ).lazy()
+
+    # Per-code lookups are gathered by code; code -1 (missing) hits the trailing entry
+    enc = lf.with_columns(
+        pl.when(pl.lit(pl.Series(is_time_based_code)).gather(pl.col("code")))
+        .then((pl.col("duration_min") / 15).floor())
+        .otherwise(1)
+        .clip(lower_bound=0)
+        .cast(pl.Int32)
+        .alias("units"),
+        pl.lit(pl.Series(rate_arr)).gather(pl.col("code")).alias("rate"),
+    ).with_columns(
+        (pl.col("units").cast(pl.Float64) * pl.col("rate")).alias("revenue"),
+    )
+
+    by_code = (
+        enc.group_by(["month", "code"])
+        .agg(
+            pl.len().cast(pl.Int64).alias("encounters"),
+            pl.col("units").cast(pl.Int64).sum().alias("total_units"),
+            pl.col("revenue").sum().alias("revenue"),
+        )
+        .sort(["month", "code"])
+    )
+    total = by_code.group_by("month", maintain_order=True).agg(
+        pl.col("encounters").sum(),
+        pl.col("total_units").sum(),
+        pl.col("revenue").sum(),
+    )
+
+    # One optimized plan for all three outputs (shared subplans run once)
+    enc, by_code, total = pl.collect_all(
+        [enc.select("units", "rate", "revenue"), by_code, total]
+    )
+
+    # Back to pandas column by column (DataFrame.to_pandas would need pyarrow)
+    def to_pandas(frame):
+        cols = {col: frame[col].to_numpy() for col in frame.columns}
+        if "month" in cols:
+            cols["month"] = cols["month"].astype(month.dtype)
+        return pd.DataFrame(cols)
+
+    by_code = to_pandas(by_code)
+    by_code.insert(
+        1,
+        "cpt_code",
+        pd.Categorical.from_codes(by_code.pop("code").to_numpy(), codes.categories),
+    )
+    return to_pandas(enc), by_code, to_pandas(total)
+
+
 def compute_revenue(
     df: pd.DataFrame,
     fiscal_year: str = "FY24",
     rates: dict[str, float] | None = None,
     time_based_codes: set[str] = TIME_BASED_CODES,
+    include_rate: bool = False,
+    engine: str = "pandas",
 ) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
     """
     Compute revenue at the encounter level and return:
@@ -124,12 +270,24 @@ def compute_revenue(
 
     Required columns:
     - encounter_date
-    - cpt_code
+    - cpt_code (strings or a category dtype; category is fastest)
     - duration_min
+
+    Optional:
+    - include_rate (bool): also keep the per-row 'rate' column (handy for debugging)
+    - engine (str): "pandas" (default) or "polars" (needs polars installed)
     """
-    # If rates aren't provided, pull them from the fiscal year
+    # Basic input check so we don't silently pick the wrong thing
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine={engine}. Use one of: {list(ENGINES)}")
+
+    # If rates aren't provided, pull them from the fiscal year (precomputed lookup)
     if rates is None:
-        rates = get_rates(fiscal_year)
+        if fiscal_year not in _FY_RATE_LOOKUPS:
+            raise ValueError(f"Unknown fiscal_year={fiscal_year}. Use one of: {sorted(_FY_RATE_LOOKUPS.keys())}")
+        rate_codes, rate_values = _FY_RATE_LOOKUPS[fiscal_year]
+    else:
+        rate_codes, rate_values = _rate_lookup(rates)
 
     # Make sure the dataframe has what we need
     required_cols = {"encounter_date", "cpt_code", "duration_min"}
@@ -137,43 +295,95 @@ def compute_revenue(
     if missing:
         raise ValueError(f"Missing required columns: {sorted(missing)}")
 
-    out = df.copy()
+    # Shallow copy: whole columns are replaced below, never edited in place
+    out = df.copy(deep=False)
 
     # Parse dates + drop rows where the date is missing/bad
-    out["encounter_date"] = pd.to_datetime(out["encounter_date"], errors="coerce")
+    out["encounter_date"] = _parse_dates(out["encounter_date"])
     out = out.dropna(subset=["encounter_date"])
 
     # Add month column for grouping
     out["month"] = _month_start(out["encounter_date"])
 
-    # Add units column (time-based vs per-encounter)
-    out = add_units(out, time_based_codes=time_based_codes)
-
-    # Map rates and compute revenue
-    # If a code isn't found, rate becomes 0 so it doesn't crash
-    out["rate"] = out["cpt_code"].map(rates).fillna(0.0)
-    out["revenue"] = out["units"] * out["rate"]
+    # Factorize cpt_code once; units, rates and the by-code groupby all reuse it.
+    # If cpt_code already comes in as a category (e.g. read_csv(dtype={"cpt_code": "category"}))
+    # its codes are reused as-is, so no per-row string hashing happens at all
+    cat = pd.Categorical(out["cpt_code"])
+
+    # Billing rate per distinct code.
+    # Unknown codes get 0 so it doesn't crash; the trailing 0.0 covers
+    # missing codes (categorical code -1)
+    rate_arr = np.append(rate_values[rate_codes.get_indexer(cat.categories)], 0.0)
+
+    # Polars does the rest of the pipeline (units, revenue, rollups) as one lazy query
+    if engine == "polars":
+        out["duration_min"] = _clean_duration(out["duration_min"])
+        enc, monthly_by_code, monthly_total = _compute_revenue_polars(
+            out["month"].to_numpy(),
+            cat,
+            out["duration_min"].to_numpy(),
+            rate_arr,
+            _time_based_lookup(cat, time_based_codes),
+        )
+        out["units"] = enc["units"].to_numpy()
+        if include_rate:
+            out["rate"] = enc["rate"].to_numpy()
+        out["revenue"] = enc["revenue"].to_numpy()
+
+        monthly_by_code["cpt_code"] = monthly_by_code["cpt_code"].astype(out["cpt_code"].dtype)
+        monthly_by_code = monthly_by_code.dropna(subset=["cpt_code"]).reset_index(drop=True)
+        return out, monthly_by_code, monthly_total
+
+    # Units (time-based vs per-encounter) + revenue
+    out = add_units(out, time_based_codes=time_based_codes, codes=cat)
+    revenue = out["units"].to_numpy() * rate_arr[cat.codes]
+
+    # Only store the rate column if asked (it's just an intermediate)
+    if include_rate:
+        out["rate"] = rate_arr[cat.codes]
+    out["revenue"] = revenue
+
+    # Narrow frame with only the groupby inputs, one contiguous 1-D array per column,
+    # so groupby never works off a wide (possibly F-ordered) block from the input.
+    # Units are widened to int64 here so the rollups come back int64 like before
+    group_input = pd.DataFrame({
+        "month": out["month"].to_numpy(),
+        "cpt_code": cat,
+        "units": out["units"].to_numpy().astype(np.int64),
+        "revenue": np.ascontiguousarray(out["revenue"].to_numpy()),
+    })
 
     # Monthly by code (helps see service mix)
+    # Group on the categorical from above so codes aren't hashed again.
+    # observed=True skips month/code combos that never happen;
+    # dropna=False keeps rows with a missing code so the totals below still count them
     monthly_by_code = (
-        out.groupby(["month", "cpt_code"], as_index=False)
+        group_input.groupby(
+            ["month", "cpt_code"], as_index=False, dropna=False, observed=True, sort=False
+        )
         .agg(
-            encounters=("cpt_code", "size"),
+            encounters=("units", "size"),
             total_units=("units", "sum"),
             revenue=("revenue", "sum"),
         )
-        .sort_values(["month", "cpt_code"])
+        .sort_values(["month", "cpt_code"], kind="stable")
     )
+    monthly_by_code["cpt_code"] = monthly_by_code["cpt_code"].astype(out["cpt_code"].dtype)
 
     # Monthly total (main trend line)
+    # Rolled up from the by-code table so we only scan the full data once.
+    # That table is already sorted by month, so sort=False keeps month order
+    # and no second sort is needed
     monthly_total = (
-        out.groupby("month", as_index=False)
+        monthly_by_code.groupby("month", as_index=False, sort=False)
         .agg(
-            encounters=("cpt_code", "size"),
-            total_units=("units", "sum"),
+            encounters=("encounters", "sum"),
+            total_units=("total_units", "sum"),
             revenue=("revenue", "sum"),
         )
-        .sort_values("month")
     )
 
+    # Missing codes were only needed for the totals
+    monthly_by_code = monthly_by_code.dropna(subset=["cpt_code"]).reset_index(drop=True)
+
     return out, monthly_by_code, monthly_total